@@ -12,6 +12,9 @@ RABBITMQ_USER = os.getenv('RABBITMQ_USER', 'guest')
 RABBITMQ_PASSWORD = os.getenv('RABBITMQ_PASSWORD', 'guest')
 RABBITMQ_VHOST = os.getenv('RABBITMQ_VHOST', '/')
 
+# 워커 동시성 (gevent 풀의 동시 작업 수, API 클라이언트의 연결 풀 크기와 같은 값 사용)
+WORKER_CONCURRENCY = int(os.getenv('WORKER_CONCURRENCY', '50'))
+
 # Celery 앱 생성
 app = Celery(
     'subway_api_tasks',
@@ -28,14 +31,27 @@ app.conf.update(
     enable_utc=True,
     task_track_started=True,
     task_time_limit=30 * 60,  # 30분
+    worker_concurrency=WORKER_CONCURRENCY,
     worker_prefetch_multiplier=1,
     worker_max_tasks_per_child=1000,
+    # 작업이 끝난 뒤 ack하여 워커가 죽어도 작업이 다시 전달되도록 함
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    broker_pool_limit=10,
+    broker_heartbeat=30,
+    # HTTP 폴링 작업은 전용 큐로 분리 (gevent 워커에서 처리)
+    task_routes={
+        'tasks.fetch_subway_*': {'queue': 'subway'},
+        'tasks.fetch_all_stations': {'queue': 'subway'},
+    },
 )
 
 # 주기적 작업 스케줄 설정 (Beat)
+# 여러 역을 추적할 때도 역마다 항목을 추가하지 않고, STATION_NAMES가 설정되어 있으면
+# 한 번의 실행에서 모든 역을 처리하는 fetch_all_stations 하나만 스케줄링
 app.conf.beat_schedule = {
     'fetch-subway-tracking-every-30-seconds': {
-        'task': 'tasks.fetch_subway_tracking_flow',
+        'task': 'tasks.fetch_all_stations' if os.getenv('STATION_NAMES') else 'tasks.fetch_subway_tracking_flow',
         'schedule': 30.0,  # 30초마다 실행
     },
 }
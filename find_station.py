@@ -11,6 +11,16 @@ from subway_api_client import SeoulSubwayAPIClient
 
 load_dotenv()
 
+# 열차 상태 코드 -> 텍스트
+_STATUS_MAP = {
+    '0': '진입',
+    '1': '도착',
+    '2': '출발',
+    '3': '전역출발',
+    '4': '전역진입',
+    '5': '전역도착',
+}
+
 
 def search_station(station_name: str, line_num: str = None):
     """
@@ -72,15 +82,7 @@ def search_station(station_name: str, line_num: str = None):
 
 def _get_status_text(status_code: str) -> str:
     """상태 코드를 텍스트로 변환"""
-    status_map = {
-        '0': '진입',
-        '1': '도착',
-        '2': '출발',
-        '3': '전역출발',
-        '4': '전역진입',
-        '5': '전역도착',
-    }
-    return status_map.get(status_code, f'알 수 없음({status_code})')
+    return _STATUS_MAP.get(status_code, f'알 수 없음({status_code})')
 
 
 def main():
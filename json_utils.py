@@ -0,0 +1,27 @@
+"""
+JSON 직렬화 헬퍼
+
+orjson이 설치되어 있으면 orjson을, 없으면 표준 라이브러리 json을 사용합니다.
+두 경우 모두 bytes를 입출력으로 사용합니다.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data: bytes):
+    """JSON bytes(또는 str)를 파이썬 객체로 변환"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj) -> bytes:
+    """파이썬 객체를 한 줄짜리 UTF-8 JSON bytes로 변환"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
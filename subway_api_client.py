@@ -1,10 +1,80 @@
 import os
 import requests
-from typing import Dict, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from requests.adapters import HTTPAdapter
+from typing import Dict, Optional, List, Tuple, TypedDict, cast
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
+import json_utils
+
 load_dotenv()
 
+# 도착 시간순 정렬 키
+_ARRIVAL_TIME_KEY = itemgetter('arrival_time')
+
+# 도착정보 응답에서 읽는 필드와 기본값 (_parse_arrival_response에서 이 순서로 언패킹)
+_ARRIVAL_KEYS, _ARRIVAL_DEFAULTS = zip(
+    ('trainNo', ''),
+    ('trainLineNm', ''),
+    ('subwayId', ''),
+    ('subwayNm', ''),
+    ('statnNm', ''),
+    ('barvlDt', 0),
+    ('arvlMsg2', ''),
+    ('arvlCd', ''),
+    ('arvlMsg3', ''),
+    ('updnLine', ''),
+    ('directAt', '0'),
+    ('lstcarAt', '0'),
+    ('trainSttus', ''),
+    ('recptnDt', ''),
+)
+
+# 위치정보 응답에서 읽는 필드와 기본값 (_parse_position_response에서 이 순서로 언패킹)
+_POSITION_KEYS, _POSITION_DEFAULTS = zip(
+    ('trainNo', ''),
+    ('trainSttus', ''),
+    ('statnNm', ''),
+    ('statnTnm', ''),
+    ('trainLineNm', ''),
+    ('updnLine', ''),
+    ('subwayId', ''),
+    ('recptnDt', ''),
+)
+
+
+class ArrivalTrain(TypedDict):
+    """실시간 도착정보의 열차 한 대 (get_realtime_arrival 결과의 data 항목)"""
+    train_no: str
+    train_line_nm: str
+    subway_id: str
+    subway_nm: str
+    station_nm: str
+    arrival_time: int
+    arrival_msg: str
+    arrival_code: str
+    current_station: str
+    up_down: str
+    direction: str
+    is_express: bool
+    is_last_train: bool
+    status: str
+    received_time: str
+
+
+class PositionTrain(TypedDict):
+    """실시간 위치정보의 열차 한 대 (get_realtime_position 결과의 data 항목)"""
+    train_no: str
+    train_status: str
+    current_station: str
+    next_station: str
+    direction: str
+    up_down: str
+    subway_id: str
+    received_time: str
+
 
 class SeoulSubwayAPIClient:
     """서울 지하철 실시간 정보 API 클라이언트"""
@@ -12,12 +82,41 @@ class SeoulSubwayAPIClient:
     # 실시간 지하철 API 도메인
     BASE_URL = "http://swopenapi.seoul.go.kr/api/subway"
 
+    # (연결 타임아웃, 읽기 타임아웃) 초
+    TIMEOUT = (3.05, 10)
+
+    # 호스트별 연결 풀 크기 (동시에 처리 가능한 요청 수)
+    # gevent 워커에서는 모든 동시 작업이 하나의 클라이언트를 공유하므로,
+    # 유지할 연결 수를 워커 동시성(WORKER_CONCURRENCY)에 맞춤
+    POOL_CONNECTIONS = 4
+    POOL_MAXSIZE = int(os.getenv('WORKER_CONCURRENCY', '50'))
+
     def __init__(self):
         self.api_key = os.getenv('SUBWAY_API_KEY')
         if not self.api_key:
             raise ValueError("SUBWAY_API_KEY가 설정되지 않았습니다. .env 파일을 확인하세요.")
 
-    def get_realtime_arrival(self, station_name: str, start_index: int = 0, end_index: int = 100) -> Dict:
+        # 호출마다 TCP 연결을 새로 맺지 않도록 keep-alive 세션을 재사용
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.POOL_CONNECTIONS,
+            pool_maxsize=self.POOL_MAXSIZE,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504]),
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # 조건부 요청용 캐시: (url, line_num, direction) -> ETag/Last-Modified와 파싱 결과
+        self._arrival_cache: Dict[tuple, Dict] = {}
+
+    def get_realtime_arrival(
+        self,
+        station_name: str,
+        start_index: int = 0,
+        end_index: int = 100,
+        line_num: Optional[str] = None,
+        direction: Optional[str] = None
+    ) -> Dict:
         """
         특정 역의 실시간 도착정보 조회
 
@@ -25,42 +124,49 @@ class SeoulSubwayAPIClient:
             station_name: 역명 (예: "신도림", "홍대입구")
             start_index: 시작 인덱스
             end_index: 종료 인덱스
+            line_num: 호선 번호 필터 (선택)
+            direction: 방향 필터 (선택)
 
         Returns:
             실시간 도착정보 응답 데이터
         """
         url = f"{self.BASE_URL}/{self.api_key}/json/realtimeStationArrival/{start_index}/{end_index}/{station_name}"
 
+        # 이전 응답의 ETag/Last-Modified가 있으면 조건부 요청
+        cache_key = (url, line_num, direction)
+        cached = self._arrival_cache.get(cache_key)
+        headers = {}
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-
-            data = response.json()
-
-            # 에러 체크 1: status 500 에러 확인 (ERROR-338 등)
-            if "status" in data and data["status"] == 500:
-                error_msg = data.get("message", "알 수 없는 에러")
-                error_code = data.get("code", "")
-                return {
-                    'success': False,
-                    'error': f"{error_code}: {error_msg}",
-                    'message': f'API 에러 ({error_code}): {error_msg}'
-                }
+            response = self.session.get(url, headers=headers, timeout=self.TIMEOUT)
 
-            # 에러 체크 2: errorMessage가 있고 status가 200이 아닌 경우
-            if "errorMessage" in data:
-                error_info = data["errorMessage"]
-                # INFO-000은 정상 응답이므로 에러가 아님
-                if error_info.get("code") != "INFO-000" and error_info.get("status") != 200:
-                    error_msg = error_info.get("message", "알 수 없는 에러")
-                    return {
-                        'success': False,
-                        'error': error_msg,
-                        'message': f'API 에러: {error_msg}'
-                    }
+            # 304: 변경 없음 -> 본문 파싱 없이 이전 결과 재사용
+            # (호출자가 결과를 정렬/수정해도 캐시가 바뀌지 않도록 복사본 반환)
+            if response.status_code == 304 and cached:
+                return self._copy_result(cached['result'])
+
+            ok, data = self._handle(response)
+            if not ok:
+                return data
 
             # 정상 응답 파싱
-            return self._parse_arrival_response(data)
+            result = self._parse_arrival_response(data, line_num, direction)
+
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if result['success'] and (etag or last_modified):
+                self._arrival_cache[cache_key] = {
+                    'etag': etag,
+                    'last_modified': last_modified,
+                    'result': self._copy_result(result),
+                }
+
+            return result
 
         except requests.exceptions.RequestException as e:
             return {
@@ -68,13 +174,76 @@ class SeoulSubwayAPIClient:
                 'error': str(e),
                 'message': 'API 요청 실패'
             }
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': '응답 파싱 실패'
+            }
+
+    @staticmethod
+    def _copy_result(result: Dict) -> Dict:
+        """파싱 결과의 얕은 복사본 (data 리스트도 새로 생성)"""
+        return {**result, 'data': list(result['data'])}
 
-    def _parse_arrival_response(self, data: Dict) -> Dict:
+    def _handle(self, response: requests.Response) -> Tuple[bool, Dict]:
+        """
+        API 응답 공통 처리 (HTTP 상태 확인, JSON 디코딩, 에러 응답 검사)
+
+        Args:
+            response: HTTP 응답
+
+        Returns:
+            (성공 여부, 성공 시 API 응답 데이터 / 실패 시 에러 결과)
+        """
+        response.raise_for_status()
+
+        # 본문이 없으면 JSON 디코딩 없이 빈 데이터로 처리
+        if response.status_code == 204 or not response.content:
+            return True, {}
+
+        data = json_utils.loads(response.content)
+        if not isinstance(data, dict):
+            raise ValueError("예상하지 못한 응답 형식입니다")
+
+        # 에러 체크 1: status 500 에러 확인 (ERROR-338 등)
+        if "status" in data and data["status"] == 500:
+            error_msg = data.get("message", "알 수 없는 에러")
+            error_code = data.get("code", "")
+            return False, {
+                'success': False,
+                'error': f"{error_code}: {error_msg}",
+                'message': f'API 에러 ({error_code}): {error_msg}'
+            }
+
+        # 에러 체크 2: errorMessage가 있고 status가 200이 아닌 경우
+        error_info = data.get("errorMessage")
+        # INFO-000은 정상 응답이므로 에러가 아님
+        if error_info and error_info.get("code") != "INFO-000" and error_info.get("status") != 200:
+            error_msg = error_info.get("message", "알 수 없는 에러")
+            return False, {
+                'success': False,
+                'error': error_msg,
+                'message': f'API 에러: {error_msg}'
+            }
+
+        return True, data
+
+    def _parse_arrival_response(
+        self,
+        data: Dict,
+        line_num: Optional[str] = None,
+        direction: Optional[str] = None
+    ) -> Dict:
         """
         실시간 도착정보 응답 파싱
 
+        필터는 원본 응답에 먼저 적용하여 조건에 맞는 열차만 딕셔너리로 변환합니다.
+
         Args:
             data: API 응답 데이터
+            line_num: 호선 번호 필터 (선택)
+            direction: 방향 필터 (선택)
 
         Returns:
             파싱된 데이터
@@ -82,45 +251,62 @@ class SeoulSubwayAPIClient:
         try:
             arrival_list = data.get('realtimeArrivalList', [])
 
-            parsed_data = []
-            for train in arrival_list:
-                parsed_data.append({
+            # 호선/방향 조건을 한 번의 순회로 적용
+            if line_num or direction:
+                arrival_list = [
+                    t for t in arrival_list
+                    if (not line_num or t.get('subwayId', '') == line_num)
+                    and (not direction or direction in (t.get('trainLineNm') or ''))
+                ]
+
+            parsed_data: List[Optional[ArrivalTrain]] = [None] * len(arrival_list)
+            for i, train in enumerate(arrival_list):
+                (
+                    train_no, train_line_nm, subway_id, subway_nm, station_nm,
+                    barvl_dt, arrival_msg, arrival_code, current_station, up_down,
+                    direct_at, lstcar_at, status, received_time,
+                ) = map(train.get, _ARRIVAL_KEYS, _ARRIVAL_DEFAULTS)
+                train_line_nm = train_line_nm or ''
+                head, sep, _ = train_line_nm.partition('-')
+
+                parsed_data[i] = {
                     # 열차 정보
-                    'train_no': train.get('trainNo', ''),  # 열차번호 (예: "2234")
-                    'train_line_nm': train.get('trainLineNm', ''),  # 도착지 방면 (예: "성수행 - 외선순환")
+                    'train_no': train_no,  # 열차번호 (예: "2234")
+                    'train_line_nm': train_line_nm,  # 도착지 방면 (예: "성수행 - 외선순환")
 
                     # 노선 정보
-                    'subway_id': train.get('subwayId', ''),  # 호선 ID (예: "1002" = 2호선)
-                    'subway_nm': train.get('subwayNm', ''),  # 호선 이름
+                    'subway_id': subway_id,  # 호선 ID (예: "1002" = 2호선)
+                    'subway_nm': subway_nm,  # 호선 이름
 
                     # 역 정보
-                    'station_nm': train.get('statnNm', ''),  # 역명
+                    'station_nm': station_nm,  # 역명
 
                     # 도착 정보
-                    'arrival_time': int(train.get('barvlDt', 0)),  # 도착 예정 시간(초)
-                    'arrival_msg': train.get('arvlMsg2', ''),  # 도착 메시지 (예: "전역 출발")
-                    'arrival_code': train.get('arvlCd', ''),  # 도착코드 (0:진입, 1:도착, 2:출발, 3:전역출발, 4:전역진입, 5:전역도착)
+                    'arrival_time': int(barvl_dt) if barvl_dt else 0,  # 도착 예정 시간(초)
+                    'arrival_msg': arrival_msg,  # 도착 메시지 (예: "전역 출발")
+                    'arrival_code': arrival_code,  # 도착코드 (0:진입, 1:도착, 2:출발, 3:전역출발, 4:전역진입, 5:전역도착)
 
                     # 현재 위치
-                    'current_station': train.get('arvlMsg3', ''),  # 현재 위치 (예: "성수")
+                    'current_station': current_station,  # 현재 위치 (예: "성수")
 
                     # 방향 정보
-                    'up_down': train.get('updnLine', ''),  # 상행/하행 (0:상행, 1:하행)
-                    'direction': train.get('trainLineNm', '').split('-')[0].strip() if '-' in train.get('trainLineNm', '') else train.get('trainLineNm', ''),
+                    'up_down': up_down,  # 상행/하행 (0:상행, 1:하행)
+                    'direction': head.strip() if sep else train_line_nm,
 
                     # 기타 정보
-                    'is_express': train.get('directAt', '0') == '1',  # 급행 여부
-                    'is_last_train': train.get('lstcarAt', '0') == '1',  # 막차 여부
-                    'status': train.get('trainSttus', ''),  # 열차상태 (0:진입, 1:도착, 2:출발, 3:전역출발)
+                    'is_express': direct_at == '1',  # 급행 여부
+                    'is_last_train': lstcar_at == '1',  # 막차 여부
+                    'status': status,  # 열차상태 (0:진입, 1:도착, 2:출발, 3:전역출발)
 
                     # 시간 정보
-                    'received_time': train.get('recptnDt', ''),  # 정보 수신 시간
-                })
+                    'received_time': received_time,  # 정보 수신 시간
+                }
 
             return {
                 'success': True,
                 'count': len(parsed_data),
-                'data': parsed_data
+                # 모든 칸이 채워졌으므로 None이 남아 있지 않음
+                'data': cast(List[ArrivalTrain], parsed_data)
             }
 
         except Exception as e:
@@ -145,32 +331,10 @@ class SeoulSubwayAPIClient:
         url = f"{self.BASE_URL}/{self.api_key}/json/realtimePosition/{start_index}/{end_index}/{line_name}"
 
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-
-            data = response.json()
-
-            # 에러 체크 1: status 500 에러 확인 (ERROR-338 등)
-            if "status" in data and data["status"] == 500:
-                error_msg = data.get("message", "알 수 없는 에러")
-                error_code = data.get("code", "")
-                return {
-                    'success': False,
-                    'error': f"{error_code}: {error_msg}",
-                    'message': f'API 에러 ({error_code}): {error_msg}'
-                }
-
-            # 에러 체크 2: errorMessage가 있고 status가 200이 아닌 경우
-            if "errorMessage" in data:
-                error_info = data["errorMessage"]
-                # INFO-000은 정상 응답이므로 에러가 아님
-                if error_info.get("code") != "INFO-000" and error_info.get("status") != 200:
-                    error_msg = error_info.get("message", "알 수 없는 에러")
-                    return {
-                        'success': False,
-                        'error': error_msg,
-                        'message': f'API 에러: {error_msg}'
-                    }
+            response = self.session.get(url, timeout=self.TIMEOUT)
+            ok, data = self._handle(response)
+            if not ok:
+                return data
 
             # 정상 응답 파싱
             return self._parse_position_response(data)
@@ -181,6 +345,12 @@ class SeoulSubwayAPIClient:
                 'error': str(e),
                 'message': 'API 요청 실패'
             }
+        except ValueError as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'message': '응답 파싱 실패'
+            }
 
     def _parse_position_response(self, data: Dict) -> Dict:
         """
@@ -195,32 +365,38 @@ class SeoulSubwayAPIClient:
         try:
             position_list = data.get('realtimePositionList', [])
 
-            parsed_data = []
-            for train in position_list:
-                parsed_data.append({
+            parsed_data: List[Optional[PositionTrain]] = [None] * len(position_list)
+            for i, train in enumerate(position_list):
+                (
+                    train_no, train_status, current_station, next_station,
+                    direction, up_down, subway_id, received_time,
+                ) = map(train.get, _POSITION_KEYS, _POSITION_DEFAULTS)
+
+                parsed_data[i] = {
                     # 열차 정보
-                    'train_no': train.get('trainNo', ''),  # 열차번호
-                    'train_status': train.get('trainSttus', ''),  # 상태 (0:진입, 1:도착, 2:출발, 3:전역출발)
+                    'train_no': train_no,  # 열차번호
+                    'train_status': train_status,  # 상태 (0:진입, 1:도착, 2:출발, 3:전역출발)
 
                     # 위치 정보
-                    'current_station': train.get('statnNm', ''),  # 현재 위치역
-                    'next_station': train.get('statnTnm', ''),  # 다음역
+                    'current_station': current_station,  # 현재 위치역
+                    'next_station': next_station,  # 다음역
 
                     # 방향 정보
-                    'direction': train.get('trainLineNm', ''),  # 행선지 (예: "성수행 - 외선순환")
-                    'up_down': train.get('updnLine', ''),  # 상행/하행
+                    'direction': direction,  # 행선지 (예: "성수행 - 외선순환")
+                    'up_down': up_down,  # 상행/하행
 
                     # 호선 정보
-                    'subway_id': train.get('subwayId', ''),  # 호선 ID
+                    'subway_id': subway_id,  # 호선 ID
 
                     # 시간 정보
-                    'received_time': train.get('recptnDt', ''),  # 수신 시간
-                })
+                    'received_time': received_time,  # 수신 시간
+                }
 
             return {
                 'success': True,
                 'count': len(parsed_data),
-                'data': parsed_data
+                # 모든 칸이 채워졌으므로 None이 남아 있지 않음
+                'data': cast(List[PositionTrain], parsed_data)
             }
 
         except Exception as e:
@@ -247,23 +423,20 @@ class SeoulSubwayAPIClient:
         Returns:
             도착 예정 열차 정보
         """
-        # 1. 실시간 도착정보 조회
-        arrival_result = self.get_realtime_arrival(station_name)
+        # 1. 실시간 도착정보 조회 (호선/방향 필터는 파싱 단계에서 적용)
+        arrival_result = self.get_realtime_arrival(
+            station_name,
+            line_num=line_num,
+            direction=direction
+        )
 
         if not arrival_result['success']:
             return arrival_result
 
         trains = arrival_result['data']
 
-        # 2. 필터링
-        if line_num:
-            trains = [t for t in trains if t['subway_id'] == line_num]
-
-        if direction:
-            trains = [t for t in trains if direction in t['train_line_nm']]
-
-        # 3. 도착 시간순 정렬
-        trains.sort(key=lambda x: x['arrival_time'])
+        # 2. 도착 시간순 정렬
+        trains.sort(key=_ARRIVAL_TIME_KEY)
 
         return {
             'success': True,
@@ -271,3 +444,33 @@ class SeoulSubwayAPIClient:
             'station_name': station_name,
             'data': trains
         }
+
+    def track_trains_to_stations(
+        self,
+        station_names: List[str],
+        line_num: Optional[str] = None,
+        direction: Optional[str] = None
+    ) -> Dict[str, Dict]:
+        """
+        여러 역으로 오는 열차를 동시에 추적
+
+        각 역의 도착정보 요청을 동시에 보내며, 모든 요청은 같은 연결 풀을 공유합니다.
+
+        Args:
+            station_names: 역명 목록 (예: ["신도림", "홍대입구"])
+            line_num: 호선 번호 (선택)
+            direction: 방향 (선택)
+
+        Returns:
+            역명별 track_train_to_station 결과
+        """
+        if not station_names:
+            return {}
+
+        max_workers = min(len(station_names), self.POOL_MAXSIZE)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(
+                lambda name: self.track_train_to_station(name, line_num, direction),
+                station_names
+            )
+            return dict(zip(station_names, results))
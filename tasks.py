@@ -1,12 +1,121 @@
+import logging
 import os
-import json
+from collections import deque
 from datetime import datetime
+from celery.concurrency import prefork
+from celery.signals import worker_process_init, worker_ready
 from celery_config import app
 from subway_api_client import SeoulSubwayAPIClient
+import json_utils
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# 추적 대상 설정 (프로세스 시작 시 한 번만 읽음)
+_STATION_NAME = os.getenv('STATION_NAME', '신도림')
+_LINE_NUM = os.getenv('LINE_NUM')
+# 여러 역 추적 시 역명 목록 (STATION_NAMES는 쉼표로 구분, 없으면 STATION_NAME)
+_STATION_NAMES = [
+    name.strip() for name in os.getenv('STATION_NAMES', '').split(',') if name.strip()
+] or [_STATION_NAME]
+
+# 열차 상태 코드 -> 텍스트
+_STATUS_MAP = {
+    '0': '진입',
+    '1': '도착',
+    '2': '출발',
+    '3': '전역출발',
+    '4': '전역진입',
+    '5': '전역도착',
+}
+
+# 호선 번호 -> 호선명
+_LINE_MAP = {
+    '1001': '1호선',
+    '1002': '2호선',
+    '1003': '3호선',
+    '1004': '4호선',
+    '1005': '5호선',
+    '1006': '6호선',
+    '1007': '7호선',
+    '1008': '8호선',
+    '1009': '9호선',
+    '1063': '경의중앙선',
+    '1065': '공항철도',
+    '1067': '경춘선',
+    '1075': '수인분당선',
+    '1077': '신분당선',
+}
+
+# 열차별 DEBUG 로그 템플릿 (fetch_subway_arrival_info)
+_ARRIVAL_INFO_TEMPLATE = (
+    "\n  === {train_no} - {train_line_nm} ===\n"
+    "  역: {station_nm}\n"
+    "  도착 예정: {arrival_time}초 ({minutes}분 {seconds}초)\n"
+    "  도착 메시지: {arrival_msg}\n"
+    "  현재 위치: {current_station}\n"
+    "  막차 여부: {last_train_text}\n"
+    "  급행 여부: {express_text}"
+)
+
+# 열차별 DEBUG 로그 템플릿 (fetch_subway_tracking_flow)
+_TRACKING_TRAIN_TEMPLATE = (
+    "\n  [{idx}번째 열차]\n"
+    "     열차번호: {train_no}\n"
+    "     방면: {train_line_nm}\n"
+    "     도착시간: {arrival_time}초 ({minutes}분 {seconds}초 후)\n"
+    "     도착메시지: {arrival_msg}\n"
+    "     현재위치: {current_station}\n"
+    "     상태: {status_text}{express_line}{last_train_line}"
+)
+
+# 데이터 로그 정리 기준 (이 크기를 넘으면 최근 LOG_KEEP_LINES개만 유지)
+LOG_MAX_BYTES = 2 * 1024 * 1024
+LOG_KEEP_LINES = 100
+
+# 워커 프로세스마다 하나의 클라이언트를 재사용 (HTTP 연결 풀 유지)
+_client = None
+
+# 위치정보 조회를 건너뛴다고 이미 경고한 호선 번호
+_unknown_line_nums = set()
+
+
+def get_client() -> SeoulSubwayAPIClient:
+    """워커 프로세스 단위로 캐시된 API 클라이언트 반환"""
+    global _client
+    if _client is None:
+        _client = SeoulSubwayAPIClient()
+    return _client
+
+
+@worker_process_init.connect
+def _init_worker_client(**kwargs):
+    """prefork 워커 프로세스 시작 시 API 클라이언트를 미리 생성"""
+    _prewarm_client()
+
+
+@worker_ready.connect
+def _init_worker_client_without_fork(sender=None, **kwargs):
+    """
+    fork하지 않는 풀(gevent, solo 등)에서 워커 준비 시점에 API 클라이언트를 미리 생성
+
+    이런 풀에서는 worker_process_init이 호출되지 않습니다. prefork 풀은 부모 프로세스가
+    태스크를 실행하지 않으므로 자식 프로세스의 worker_process_init에 맡깁니다.
+    """
+    if not isinstance(getattr(sender, 'pool', None), prefork.TaskPool):
+        _prewarm_client()
+
+
+def _prewarm_client():
+    """API 클라이언트를 생성하고, 실패하면 기록만 함"""
+    try:
+        get_client()
+    except ValueError as e:
+        # 키가 없으면 태스크 실행 시점에 다시 에러가 발생하므로 여기서는 기록만 함
+        logger.error("API 클라이언트 초기화 실패: %s", e)
+
 
 @app.task(bind=True, name='tasks.fetch_subway_arrival_info')
 def fetch_subway_arrival_info(self, station_name: str = None, line_num: str = None):
@@ -20,15 +129,15 @@ def fetch_subway_arrival_info(self, station_name: str = None, line_num: str = No
     Returns:
         처리 결과 딕셔너리
     """
-    print(f"[{datetime.now()}] 지하철 도착 정보 수집 시작 - Task ID: {self.request.id}")
+    logger.debug("지하철 도착 정보 수집 시작 - Task ID: %s", self.request.id)
 
     try:
-        # API 클라이언트 초기화
-        client = SeoulSubwayAPIClient()
+        # API 클라이언트 (워커 프로세스 단위로 재사용)
+        client = get_client()
 
         # 환경변수에서 설정 가져오기
-        station_name = station_name or os.getenv('STATION_NAME', '신도림')
-        line_num = line_num or os.getenv('LINE_NUM')
+        station_name = station_name or _STATION_NAME
+        line_num = line_num or _LINE_NUM
 
         if not station_name:
             raise ValueError("STATION_NAME이 설정되지 않았습니다.")
@@ -40,17 +149,21 @@ def fetch_subway_arrival_info(self, station_name: str = None, line_num: str = No
         )
 
         if result['success']:
-            print(f"✓ 성공: {result['count']}개의 열차 정보 수집")
-
-            # 수집된 데이터 로깅
-            for train in result['data']:
-                print(f"\n  === {train['train_no']} - {train['train_line_nm']} ===")
-                print(f"  역: {train['station_nm']}")
-                print(f"  도착 예정: {train['arrival_time']}초 ({train['arrival_time']//60}분 {train['arrival_time']%60}초)")
-                print(f"  도착 메시지: {train['arrival_msg']}")
-                print(f"  현재 위치: {train['current_station']}")
-                print(f"  막차 여부: {'막차' if train['is_last_train'] else '일반'}")
-                print(f"  급행 여부: {'급행' if train['is_express'] else '완행'}")
+            logger.info("✓ 성공: 역=%s, %d개의 열차 정보 수집", station_name, result['count'])
+
+            # 수집된 데이터 로깅 (DEBUG 레벨일 때만 문자열 생성)
+            if logger.isEnabledFor(logging.DEBUG):
+                buf = [
+                    _ARRIVAL_INFO_TEMPLATE.format(
+                        minutes=train['arrival_time'] // 60,
+                        seconds=train['arrival_time'] % 60,
+                        last_train_text='막차' if train['is_last_train'] else '일반',
+                        express_text='급행' if train['is_express'] else '완행',
+                        **train
+                    )
+                    for train in result['data']
+                ]
+                logger.debug("\n".join(buf))
 
             # 데이터 처리 (로그 저장)
             process_subway_data(result['data'])
@@ -62,7 +175,7 @@ def fetch_subway_arrival_info(self, station_name: str = None, line_num: str = No
                 'task_id': self.request.id
             }
         else:
-            print(f"✗ 실패: {result.get('message', 'Unknown error')}")
+            logger.warning("✗ 실패: %s", result.get('message', 'Unknown error'))
             return {
                 'status': 'failed',
                 'timestamp': datetime.now().isoformat(),
@@ -71,7 +184,7 @@ def fetch_subway_arrival_info(self, station_name: str = None, line_num: str = No
             }
 
     except Exception as e:
-        print(f"✗ 예외 발생: {str(e)}")
+        logger.error("✗ 예외 발생: %s", e)
         # Celery의 자동 재시도 기능 활용
         raise self.retry(exc=e, countdown=60, max_retries=3)
 
@@ -89,31 +202,32 @@ def process_subway_data(subway_data_list):
     # 데모용 로그 저장
     log_dir = 'logs'
     os.makedirs(log_dir, exist_ok=True)
-    log_file = os.path.join(log_dir, 'subway_data_log.json')
+    log_file = os.path.join(log_dir, 'subway_data_log.jsonl')
 
     log_entry = {
         'timestamp': datetime.now().isoformat(),
         'data': subway_data_list
     }
 
-    # 기존 로그 읽기
-    logs = []
-    if os.path.exists(log_file):
-        try:
-            with open(log_file, 'r', encoding='utf-8') as f:
-                logs = json.load(f)
-        except:
-            logs = []
+    # 한 줄씩 추가만 하고, 파일이 커졌을 때만 최근 항목으로 정리
+    with open(log_file, 'ab') as f:
+        f.write(json_utils.dumps(log_entry) + b'\n')
+
+    if os.path.getsize(log_file) > LOG_MAX_BYTES:
+        _rotate_to_last_n_lines(log_file, LOG_KEEP_LINES)
+
+    logger.debug("  → 데이터 처리 완료: %s에 저장됨", log_file)
 
-    # 새 로그 추가 (최근 100개만 유지)
-    logs.append(log_entry)
-    logs = logs[-100:]
 
-    # 로그 저장
-    with open(log_file, 'w', encoding='utf-8') as f:
-        json.dump(logs, f, ensure_ascii=False, indent=2)
+def _rotate_to_last_n_lines(path: str, n: int):
+    """JSONL 파일을 마지막 n줄만 남기도록 정리"""
+    with open(path, 'rb') as f:
+        tail = deque(f, maxlen=n)
 
-    print(f"  → 데이터 처리 완료: {log_file}에 저장됨")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.writelines(tail)
+    os.replace(tmp_path, path)
 
 
 @app.task(bind=True, name='tasks.fetch_subway_tracking_flow')
@@ -125,26 +239,31 @@ def fetch_subway_tracking_flow(self):
     2단계: 해당 노선의 실시간 위치정보 조회
     3단계: 열차 번호로 매칭하여 상세 위치 추적
 
+    3단계 결과는 DEBUG 로그로만 출력되므로, 위치정보 API는 DEBUG 레벨이고
+    도착정보에서 추적할 열차를 찾았을 때만 요청합니다.
+
     Returns:
         처리 결과 딕셔너리
     """
-    print(f"\n{'='*80}")
-    print(f"🚇 서울 지하철 실시간 추적 시스템 - Task ID: {self.request.id}")
-    print(f"{'='*80}")
+    logger.debug("🚇 서울 지하철 실시간 추적 시스템 - Task ID: %s", self.request.id)
 
     try:
-        client = SeoulSubwayAPIClient()
+        client = get_client()
 
         # 환경변수에서 설정 가져오기
-        station_name = os.getenv('STATION_NAME', '신도림')
-        line_num = os.getenv('LINE_NUM')
+        station_name = _STATION_NAME
+        line_num = _LINE_NUM
 
-        print(f"\n📍 추적 대상:")
-        print(f"  - 역명: {station_name}")
-        print(f"  - 호선: {line_num}")
+        logger.debug("📍 추적 대상: 역명=%s, 호선=%s", station_name, line_num)
 
         # ====== 1단계: 도착정보 조회 ======
-        print(f"\n🔍 [1단계] 실시간 도착정보 조회 중...")
+        logger.debug("🔍 [1단계] 실시간 도착정보 조회 중...")
+        line_name = _convert_line_num_to_name(line_num)
+        if line_num and not line_name and line_num not in _unknown_line_nums:
+            # 같은 경고가 매 실행마다 반복되지 않도록 호선 번호별로 한 번만 기록
+            _unknown_line_nums.add(line_num)
+            logger.warning("알 수 없는 호선 번호 %s: 위치정보 조회를 건너뜁니다", line_num)
+
         arrival_result = client.track_train_to_station(
             station_name=station_name,
             line_num=line_num
@@ -152,7 +271,7 @@ def fetch_subway_tracking_flow(self):
 
         if not arrival_result['success'] or arrival_result['count'] == 0:
             error_msg = arrival_result.get('message', '도착 정보를 찾을 수 없습니다')
-            print(f"  ❌ 실패: {error_msg}")
+            logger.warning("❌ 실패: %s", error_msg)
             return {
                 'status': 'failed',
                 'stage': 'arrival_info',
@@ -162,28 +281,29 @@ def fetch_subway_tracking_flow(self):
             }
 
         trains = arrival_result['data']
-        print(f"  ✅ 도착 정보 조회 성공: {len(trains)}대의 열차 발견")
+        logger.debug("✅ 도착 정보 조회 성공: %d대의 열차 발견", len(trains))
 
         # ====== 2단계: 각 열차 정보 출력 ======
-        print(f"\n🚇 [2단계] 열차별 상세 정보")
-        print(f"{'─'*80}")
+        tracked_trains = trains[:5]  # 최대 5개만 추적
+
+        # DEBUG 레벨일 때만 열차별 상세 정보 문자열 생성
+        if logger.isEnabledFor(logging.DEBUG):
+            buf = ["🚇 [2단계] 열차별 상세 정보"]
+            for idx, train in enumerate(tracked_trains, 1):
+                buf.append(_TRACKING_TRAIN_TEMPLATE.format(
+                    idx=idx,
+                    minutes=train['arrival_time'] // 60,
+                    seconds=train['arrival_time'] % 60,
+                    status_text=_get_train_status_text(train['status']),
+                    express_line="\n     🚄 급행열차" if train['is_express'] else "",
+                    last_train_line="\n     🌙 막차" if train['is_last_train'] else "",
+                    **train
+                ))
+            logger.debug("\n".join(buf))
 
         all_train_data = []
 
-        for idx, train in enumerate(trains[:5], 1):  # 최대 5개만 표시
-            print(f"\n  [{idx}번째 열차]")
-            print(f"     열차번호: {train['train_no']}")
-            print(f"     방면: {train['train_line_nm']}")
-            print(f"     도착시간: {train['arrival_time']}초 ({train['arrival_time']//60}분 {train['arrival_time']%60}초 후)")
-            print(f"     도착메시지: {train['arrival_msg']}")
-            print(f"     현재위치: {train['current_station']}")
-            print(f"     상태: {_get_train_status_text(train['status'])}")
-
-            if train['is_express']:
-                print(f"     🚄 급행열차")
-            if train['is_last_train']:
-                print(f"     🌙 막차")
-
+        for train in tracked_trains:
             all_train_data.append({
                 'train_no': train['train_no'],
                 'direction': train['direction'],
@@ -195,27 +315,24 @@ def fetch_subway_tracking_flow(self):
                 'is_last_train': train['is_last_train'],
             })
 
-        # ====== 3단계: 호선 전체 위치정보 조회 (선택적) ======
-        line_name = _convert_line_num_to_name(line_num)
-        if line_name:
-            print(f"\n📍 [3단계] {line_name} 전체 열차 위치 조회 중...")
+        # ====== 3단계: 호선 전체 위치정보 조회 ======
+        # 위치정보는 DEBUG 로그에만 쓰이므로, DEBUG 레벨이고 추적할 열차가 있을 때만 요청
+        if line_name and all_train_data and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("📍 [3단계] %s 전체 열차 위치 조회 중...", line_name)
             position_result = client.get_realtime_position(line_name)
 
             if position_result['success'] and position_result['count'] > 0:
-                print(f"  ✅ 위치 정보 조회 성공: {position_result['count']}대의 열차 운행 중")
+                logger.debug("✅ 위치 정보 조회 성공: %d대의 열차 운행 중", position_result['count'])
 
                 # 우리가 추적하는 열차들과 매칭
-                tracked_train_nos = [t['train_no'] for t in all_train_data]
+                tracked_train_nos = {t['train_no'] for t in all_train_data}
                 for pos in position_result['data']:
                     if pos['train_no'] in tracked_train_nos:
-                        print(f"     🎯 {pos['train_no']}: {pos['current_station']} → {pos['next_station']}")
+                        logger.debug("🎯 %s: %s → %s", pos['train_no'], pos['current_station'], pos['next_station'])
             else:
-                print(f"  ⚠️  위치 정보 조회 실패 또는 데이터 없음")
+                logger.debug("⚠️  위치 정보 조회 실패 또는 데이터 없음")
 
-        print(f"\n{'='*80}")
-        print(f"✨ 전체 프로세스 완료!")
-        print(f"   → {len(all_train_data)}대의 열차를 추적하고 있습니다!")
-        print(f"{'='*80}\n")
+        logger.info("✨ 추적 완료: 역=%s, %d대의 열차를 추적하고 있습니다", station_name, len(all_train_data))
 
         # 전체 데이터를 로그에 저장
         full_tracking_data = {
@@ -235,45 +352,77 @@ def fetch_subway_tracking_flow(self):
         }
 
     except Exception as e:
-        print(f"✗ 예외 발생: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("✗ 예외 발생: %s", e)
+        # Celery의 자동 재시도 기능 활용
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+
+@app.task(bind=True, name='tasks.fetch_all_stations')
+def fetch_all_stations(self, stations: list = None, line_num: str = None):
+    """
+    여러 역의 도착 정보를 한 번에 수집하는 Celery 태스크
+
+    역마다 Beat 스케줄을 추가하지 않고, 한 번의 실행에서 모든 역의 요청을
+    동시에 보냅니다.
+
+    Args:
+        stations: 역명 목록 (기본값: 환경변수 STATION_NAMES, 없으면 STATION_NAME)
+        line_num: 호선 번호 (환경변수에서 가져옴)
+
+    Returns:
+        처리 결과 딕셔너리
+    """
+    logger.debug("여러 역 도착 정보 수집 시작 - Task ID: %s", self.request.id)
+
+    try:
+        client = get_client()
+
+        stations = stations or _STATION_NAMES
+        line_num = line_num or _LINE_NUM
+
+        results = client.track_trains_to_stations(stations, line_num=line_num)
+
+        station_counts = {}
+        tracking_data = []
+        for station_name, result in results.items():
+            if not result['success']:
+                logger.warning("✗ 실패: 역=%s, %s", station_name, result.get('message', 'Unknown error'))
+                continue
+
+            station_counts[station_name] = result['count']
+            tracking_data.append({
+                'station_name': station_name,
+                'line_num': line_num,
+                'trains': result['data']
+            })
+
+        if tracking_data:
+            process_subway_data(tracking_data)
+
+        logger.info("✓ 성공: %d/%d개 역 정보 수집", len(station_counts), len(stations))
+
+        return {
+            'status': 'success' if station_counts else 'failed',
+            'timestamp': datetime.now().isoformat(),
+            'station_counts': station_counts,
+            'failed_stations': [name for name in results if name not in station_counts],
+            'task_id': self.request.id
+        }
+
+    except Exception as e:
+        logger.error("✗ 예외 발생: %s", e)
         # Celery의 자동 재시도 기능 활용
         raise self.retry(exc=e, countdown=60, max_retries=3)
 
 
 def _get_train_status_text(status_code: str) -> str:
     """열차 상태 코드를 텍스트로 변환"""
-    status_map = {
-        '0': '진입',
-        '1': '도착',
-        '2': '출발',
-        '3': '전역출발',
-        '4': '전역진입',
-        '5': '전역도착',
-    }
-    return status_map.get(status_code, f'알 수 없음({status_code})')
+    return _STATUS_MAP.get(status_code, f'알 수 없음({status_code})')
 
 
 def _convert_line_num_to_name(line_num: str) -> str:
     """호선 번호를 호선명으로 변환"""
-    line_map = {
-        '1001': '1호선',
-        '1002': '2호선',
-        '1003': '3호선',
-        '1004': '4호선',
-        '1005': '5호선',
-        '1006': '6호선',
-        '1007': '7호선',
-        '1008': '8호선',
-        '1009': '9호선',
-        '1063': '경의중앙선',
-        '1065': '공항철도',
-        '1067': '경춘선',
-        '1075': '수인분당선',
-        '1077': '신분당선',
-    }
-    return line_map.get(line_num, '')
+    return _LINE_MAP.get(line_num, '')
 
 
 @app.task(name='tasks.manual_trigger')
@@ -281,5 +430,5 @@ def manual_trigger():
     """
     수동으로 트리거할 수 있는 테스트 태스크
     """
-    print(f"[{datetime.now()}] 수동 트리거 태스크 실행")
+    logger.info("수동 트리거 태스크 실행")
     return fetch_subway_arrival_info()